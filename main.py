@@ -9,12 +9,19 @@ Uses Moscow time and monitors a full week ahead.
 import asyncio
 import logging
 import sys
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 
 from src.config import Config
 from src.telegram_bot import TelegramNotifier
 from src.nuclear_monitor import NuclearMonitor
 
+# Faster event loop where available (not on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -58,12 +65,21 @@ async def main():
     logger.info(f"   • Sessions: {nuclear_monitor.sessions_base_url}&date=YYYY-MM-DD")
     logger.info(f"Check interval: {Config.CHECK_INTERVAL} seconds")
     
-    # Start bot polling for ping commands
+    # Start receiving bot updates for ping commands
     try:
-        await telegram.start_polling()
-        logger.info("Bot polling started - ping/pong commands enabled")
+        if Config.WEBHOOK_URL:
+            await telegram.start_webhook(Config.WEBHOOK_URL, Config.WEBHOOK_PORT, Config.WEBHOOK_SECRET, Config.WEBHOOK_LISTEN)
+            logger.info("Bot webhook started - ping/pong commands enabled")
+        else:
+            await telegram.start_polling()
+            logger.info("Bot polling started - ping/pong commands enabled")
     except Exception as e:
-        logger.error(f"Failed to start bot polling: {e}")
+        logger.error(f"Failed to start bot updates: {e}")
+        # Startup may have failed after the application was initialized
+        try:
+            await telegram.close()
+        except Exception as e:
+            logger.error(f"Error during cleanup: {e}")
         return
     
     # Send startup notification
@@ -81,7 +97,7 @@ async def main():
     # Main monitoring loop
     logger.info("Starting nuclear monitoring loop...")
     
-    last_notification_time = None
+    last_notification_ts = float("-inf")  # monotonic clock may start near zero
     
     try:
         while True:
@@ -91,23 +107,16 @@ async def main():
                 
                 # Log status
                 moscow_time_str = results['moscow_time_str']
-                moscow_time = nuclear_monitor.get_moscow_time()
                 endpoints_checked = len(results['endpoints'])
                 
 
                 if results['any_changes']:
-                    send_message = False
-                    if last_notification_time is None:
-                        send_message = True
-                    elif moscow_time > last_notification_time + timedelta(minutes=1):
-                        send_message = True
-
-                    if send_message:
+                    if time.monotonic() - last_notification_ts >= 60:
                         try:
                             message = nuclear_monitor.format_change_message(results)
                             await telegram.send_message(message)
                             logger.info("Change notification sent")
-                            last_notification_time = moscow_time
+                            last_notification_ts = time.monotonic()
                         except Exception as e:
                             logger.error(f"Failed to send notification: {e}")
                     else:
@@ -115,11 +124,12 @@ async def main():
                 else:
                     logger.info(f"No changes - {endpoints_checked} endpoints checked at {moscow_time_str}")
 
-                # Log endpoint statuses (debug level)
+                # Log endpoint statuses (successes at debug level only)
+                debug_enabled = logger.isEnabledFor(logging.DEBUG)
                 for endpoint_key, result in results['endpoints'].items():
                     if result['success']:
-                        hash_preview = result['content_hash'][:8]
-                        logger.debug(f"   {endpoint_key}: OK {hash_preview}...")
+                        if debug_enabled:
+                            logger.debug("   %s: OK %s...", endpoint_key, result['content_hash'][:8])
                     else:
                         error = result.get('error', 'Unknown error')
                         logger.warning(f"   {endpoint_key}: ERROR {error}")
@@ -149,11 +159,15 @@ Monitor will continue running..."""
             await telegram.close()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
+        try:
+            await nuclear_monitor.close()
+        except Exception as e:
+            logger.error(f"Error during cleanup: {e}")
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(), loop_factory=uvloop.new_event_loop if uvloop else None)
     except KeyboardInterrupt:
         logger.info("Padel monitor stopped by user")
     except Exception as e:
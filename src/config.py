@@ -1,6 +1,7 @@
 """Configuration settings for the padel monitor."""
 
 import os
+import re
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -17,6 +18,13 @@ class Config:
     # Monitoring settings
     CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '10'))  # seconds
     
+    # Webhook settings (long polling is used when WEBHOOK_URL is not set)
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    # Telegram echoes this in X-Telegram-Bot-Api-Secret-Token so forged updates are rejected
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    
     @classmethod
     def validate(cls):
         """Validate that all required settings are present."""
@@ -26,4 +34,11 @@ class Config:
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
         
+        if cls.WEBHOOK_URL:
+            if not cls.WEBHOOK_SECRET:
+                raise ValueError("WEBHOOK_SECRET is required when WEBHOOK_URL is set")
+            # Telegram only accepts 1-256 characters from A-Z, a-z, 0-9, _ and -
+            if not re.fullmatch(r'[A-Za-z0-9_-]{1,256}', cls.WEBHOOK_SECRET):
+                raise ValueError("WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ or -")
+        
         return True 
\ No newline at end of file
@@ -1,14 +1,32 @@
 """Nuclear option: Monitor ALL API endpoints for ANY changes."""
 
+import asyncio
 import aiohttp
 import hashlib
 import logging
-import json
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Union
+from yarl import URL
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
 
 logger = logging.getLogger(__name__)
 
+# Simple message as requested
+_CHANGE_MESSAGE = """ПАДЛА ПАДЛА ПАДЛА
+
+https://bilet.mos.ru/event/344458257/"""
+
+# All endpoints live on tickets.mos.ru, so the per-host connection limit is
+# the real ceiling for concurrent requests
+_MAX_CONCURRENCY = 16
+
+# Time budget for one fetch cycle, however many waves the semaphore causes
+_FETCH_TIMEOUT = 30  # seconds
+
 
 class NuclearMonitor:
     """Monitors all API endpoints and detects ANY changes."""
@@ -23,14 +41,51 @@ class NuclearMonitor:
         self.event_url = "https://tickets.mos.ru/widget/api/widget/getevents?event_id=65305&agent_uid=museum1038"
         self.sessions_base_url = "https://tickets.mos.ru/widget/api/widget/events/getperformances?event_id=65305&agent_uid=museum1038"
         
+        # Moscow is UTC+3
+        self._moscow_tz = timezone(timedelta(hours=3))
+        
         # Store hashes for change detection
         self.previous_hashes = {}
         
+        # Shared HTTP session, created lazily inside the running event loop
+        self._session = None
+        
+        # Endpoint list cache, rebuilt when the Moscow date rolls over
+        self._url_cache_date = None
+        self._monitoring_dates = None
+        self._endpoints_to_fetch = None
+        
+        # AIMD limit on in-flight requests, backs off when upstream struggles
+        self._concurrency = _MAX_CONCURRENCY
+        self._sema = asyncio.Semaphore(self._concurrency)
+        
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=_MAX_CONCURRENCY,
+                limit_per_host=_MAX_CONCURRENCY,
+                ttl_dns_cache=300,
+                keepalive_timeout=75
+            )
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        
     def get_moscow_time(self) -> datetime:
         """Get current Moscow time."""
-        # Moscow is UTC+3
-        moscow_tz = timezone(timedelta(hours=3))
-        return datetime.now(moscow_tz)
+        return datetime.now(self._moscow_tz)
     
     def get_monitoring_dates(self) -> list:
         """Get dates to monitor (today + 7 days ahead in Moscow time)."""
@@ -44,22 +99,34 @@ class NuclearMonitor:
         
         return dates
     
-    async def fetch_endpoint(self, session: aiohttp.ClientSession, url: str, endpoint_name: str) -> Dict[str, Any]:
-        """Fetch data from an endpoint and return normalized result."""
+    async def fetch_endpoint(self, session: aiohttp.ClientSession, url: Union[str, URL], endpoint_name: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Fetch data from an endpoint and return normalized result.
+        
+        deadline is an event loop time bounding the whole call, including
+        the wait for a concurrency slot.
+        """
+        timestamp = self.get_moscow_time().isoformat()
+        
         try:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+            async with asyncio.timeout_at(deadline), self._sema, session.get(url, timeout=aiohttp.ClientTimeout(total=_FETCH_TIMEOUT)) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    content_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+                    # Hash the raw body as it streams in, without buffering it
+                    hasher = blake3() if blake3 is not None else hashlib.sha256()
+                    async for chunk in response.content.iter_chunked(65536):
+                        hasher.update(chunk)
+                    
+                    if blake3 is not None:
+                        content_hash = hasher.hexdigest(length=16)
+                    else:
+                        content_hash = hasher.hexdigest()
                     
                     return {
                         'success': True,
                         'endpoint': endpoint_name,
                         'url': url,
                         'status_code': response.status,
-                        'data': data,
                         'content_hash': content_hash,
-                        'timestamp': self.get_moscow_time().isoformat()
+                        'timestamp': timestamp
                     }
                 else:
                     return {
@@ -68,52 +135,95 @@ class NuclearMonitor:
                         'url': url,
                         'status_code': response.status,
                         'error': f'HTTP {response.status}',
-                        'timestamp': self.get_moscow_time().isoformat()
+                        'timestamp': timestamp
                     }
                     
         except Exception as e:
-            return {
-                'success': False,
-                'endpoint': endpoint_name,
-                'url': url,
-                'error': str(e),
-                'timestamp': self.get_moscow_time().isoformat()
-            }
+            return self._error_result(endpoint_name, url, e, timestamp)
+    
+    def _error_result(self, endpoint_name: str, url: Union[str, URL], error: BaseException, timestamp: str) -> Dict[str, Any]:
+        """Build the result for a request that failed without a response."""
+        return {
+            'success': False,
+            'endpoint': endpoint_name,
+            'url': url,
+            # Some exceptions (e.g. TimeoutError) have an empty message
+            'error': str(error) or type(error).__name__,
+            'timestamp': timestamp
+        }
     
     async def fetch_all_content(self) -> Dict[str, Any]:
         """Fetch content from all endpoints."""
-        monitoring_dates = self.get_monitoring_dates()
+        today = self.get_moscow_time().date()
         
-        logger.info(f"Monitoring dates: {', '.join(monitoring_dates)}")
+        # Rebuild list of all endpoints to fetch only when the date changes
+        if today != self._url_cache_date:
+            self._monitoring_dates = self.get_monitoring_dates()
+            
+            endpoints_to_fetch = [
+                ("agent_info", self.agent_url),
+                ("event_info", self.event_url),
+            ]
+            
+            # Add session endpoints for each date
+            for date_str in self._monitoring_dates:
+                endpoint_key = f"sessions_{date_str}"
+                sessions_url = f"{self.sessions_base_url}&date={date_str}"
+                endpoints_to_fetch.append((endpoint_key, sessions_url))
+            
+            # Pre-parse URLs so aiohttp doesn't re-parse them on every request
+            self._endpoints_to_fetch = [(key, URL(url)) for key, url in endpoints_to_fetch]
+            self._url_cache_date = today
         
-        # Build list of all endpoints to fetch
-        endpoints_to_fetch = [
-            ("agent_info", self.agent_url),
-            ("event_info", self.event_url),
-        ]
+        endpoints_to_fetch = self._endpoints_to_fetch
         
-        # Add session endpoints for each date
-        for date_str in monitoring_dates:
-            endpoint_key = f"sessions_{date_str}"
-            sessions_url = f"{self.sessions_base_url}&date={date_str}"
-            endpoints_to_fetch.append((endpoint_key, sessions_url))
+        logger.info(f"Monitoring dates: {', '.join(self._monitoring_dates)}")
         
         # Fetch all endpoints
         endpoints_data = {}
-        async with aiohttp.ClientSession(headers=self.headers) as session:
-            # Fetch all endpoints concurrently
-            tasks = []
-            for endpoint_key, url in endpoints_to_fetch:
-                task = self.fetch_endpoint(session, url, endpoint_key)
-                tasks.append((endpoint_key, task))
-            
-            # Wait for all tasks to complete
-            for endpoint_key, task in tasks:
-                result = await task
-                endpoints_data[endpoint_key] = result
+        session = self._get_session()
+        
+        # Fetch all endpoints concurrently, under one deadline for the whole cycle
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + _FETCH_TIMEOUT
+        coros = [self.fetch_endpoint(session, url, endpoint_key, deadline) for endpoint_key, url in endpoints_to_fetch]
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        elapsed = loop.time() - started
+        
+        for (endpoint_key, url), result in zip(endpoints_to_fetch, results):
+            if isinstance(result, BaseException):
+                # Keep the same shape fetch_endpoint returns on failure
+                result = self._error_result(endpoint_key, url, result, self.get_moscow_time().isoformat())
+            endpoints_data[endpoint_key] = result
+        
+        self._adjust_concurrency(endpoints_data, elapsed)
         
         return endpoints_data
     
+    def _adjust_concurrency(self, endpoints_data: Dict[str, Any], elapsed: float):
+        """Halve concurrency on throttling/server errors, otherwise ramp up by one."""
+        upstream_errors = 0
+        for result in endpoints_data.values():
+            if result['success']:
+                continue
+            status_code = result.get('status_code')
+            # No status code means the request itself failed (timeout, connection error)
+            if status_code is None or status_code == 429 or status_code >= 500:
+                upstream_errors += 1
+        
+        if upstream_errors:
+            concurrency = max(1, int(self._concurrency * 0.5))
+        else:
+            concurrency = min(_MAX_CONCURRENCY, self._concurrency + 1)
+        
+        if concurrency != self._concurrency:
+            if upstream_errors:
+                logger.warning(f"Upstream errors on {upstream_errors} endpoint(s) in a {elapsed:.1f}s cycle, concurrency {self._concurrency} → {concurrency}")
+            self._concurrency = concurrency
+            # Safe to replace: no requests are in flight between fetch cycles
+            self._sema = asyncio.Semaphore(concurrency)
+    
     def check_content_for_changes(self, endpoints_data: Dict[str, Any]) -> Dict[str, Any]:
         """Check fetched content for changes and return change information."""
         changes_detected = []
@@ -164,12 +274,13 @@ class NuclearMonitor:
     async def check_all_endpoints(self) -> Dict[str, Any]:
         """Check all endpoints and detect changes."""
         moscow_time = self.get_moscow_time()
-        monitoring_dates = self.get_monitoring_dates()
         
         logger.info(f"Moscow time: {moscow_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
         
         # Fetch all content
         endpoints_data = await self.fetch_all_content()
+        # The dates that were actually fetched, cached until the date changes
+        monitoring_dates = self._monitoring_dates
         
         # Check for changes
         change_results = self.check_content_for_changes(endpoints_data)
@@ -188,15 +299,7 @@ class NuclearMonitor:
     
     def format_change_message(self, results: Dict[str, Any]) -> str:
         """Format a notification message for detected changes."""
-        changes = results['changes_detected']
-        
-        if not changes:
-            return "No changes"
-        
-        # Simple message as requested
-        return f"""ПАДЛА ПАДЛА ПАДЛА
-
-https://bilet.mos.ru/event/344458257/"""
+        return _CHANGE_MESSAGE
     
     async def get_status_summary(self) -> str:
         """Get a summary of current monitoring status."""
@@ -6,9 +6,30 @@ import dataclasses
 from typing import List, Dict, Optional, Tuple
 import logging
 import hashlib
+from sortedcontainers import SortedKeyList
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
 
 logger = logging.getLogger(__name__)
 
+# Precompiled date patterns
+_PAT_DATE_WITH_YEAR = re.compile(r'(\d{1,2})\s+([а-яё]+)\s+(\d{4})')  # 12 июля 2025
+_PAT_DATE_NO_YEAR = re.compile(r'(\d{1,2})\s+([а-яё]+)(?!\s+\d{4})')  # 12 июля
+
+# Precompiled time range patterns
+_PAT_DO = re.compile(r'(?:с|от)?\s*(\d{1,2})[:\.](\d{2})\s+до\s+(\d{1,2})[:\.](\d{2})')  # (с|от)? HH:MM до HH:MM
+_PAT_SHORT = re.compile(r'(\d{1,2})-(\d{1,2})(?!\d)')  # HH-HH
+_PAT_DASH = re.compile(r'(\d{1,2})[:\.](\d{2})-(\d{1,2})[:\.](\d{2})')  # HH:MM-HH:MM
+
+# Precompiled single time patterns
+_PAT_AT_HM = re.compile(r'в\s+(\d{1,2})[:\.](\d{2})')  # в HH:MM
+_PAT_AT_H = re.compile(r'в\s+(\d{1,2})(?![:\.])')  # в HH
+_PAT_VREMYA = re.compile(r'время\s+(\d{1,2})[:\.](\d{2})')  # время HH:MM
+_PAT_STANDALONE = re.compile(r'(?<!\d)(\d{1,2})[:\.](\d{2})(?!\s*[-до])')  # HH:MM
+
 
 @dataclasses.dataclass
 class Slot:
@@ -33,7 +54,10 @@ class ScheduleManager:
     """Manages padel slot schedules with Russian date/time parsing."""
     
     def __init__(self):
-        self.slots = set()  # In-memory storage as set to prevent duplicates
+        # In-memory storage keyed by (start_time, end_time) to prevent duplicates
+        self._slots_by_key: Dict[Tuple[datetime, datetime], Slot] = {}
+        # Same slots ordered by start time for range queries
+        self._slots_sorted = SortedKeyList(key=lambda slot: slot.start_time)
         
         # Russian month names mapping
         self.russian_months = {
@@ -69,46 +93,80 @@ class ScheduleManager:
             'послезавтра': 2
         }
         
+        # Keyword alternations (longest first, so 'понедельника' wins over 'пн')
+        self._weekday_re = self._build_keyword_re(self.russian_weekdays)
+        self._relative_re = self._build_keyword_re(self.relative_dates)
+        
+        # Keyword priority follows mapping order, as in the original lookups
+        self._weekday_priority = {name: i for i, name in enumerate(self.russian_weekdays)}
+        self._relative_priority = {name: i for i, name in enumerate(self.relative_dates)}
+        
         # Moscow timezone
         self.moscow_tz = timezone(timedelta(hours=3))
     
-    def parse_weekday_date(self, text: str) -> Optional[datetime]:
+    @staticmethod
+    def _build_keyword_re(keywords: Dict[str, int]) -> re.Pattern:
+        """Compile keywords into a single alternation regex."""
+        return re.compile('|'.join(sorted(map(re.escape, keywords), key=len, reverse=True)))
+    
+    @staticmethod
+    def _find_keyword(pattern: re.Pattern, priority: Dict[str, int], text_lower: str) -> Optional[str]:
+        """Find the highest-priority keyword in text with a single regex pass."""
+        matches = [match.group(0) for match in pattern.finditer(text_lower)]
+        if not matches:
+            return None
+        return min(matches, key=priority.__getitem__)
+    
+    def parse_weekday_date(self, text: str, now: Optional[datetime] = None) -> Optional[datetime]:
         """Parse weekday names like 'понедельник' -> next Monday."""
-        text_lower = text.lower()
-        
+        if now is None:
+            now = datetime.now(self.moscow_tz)
+        return self._parse_weekday_date(text.lower(), now)
+    
+    def _parse_weekday_date(self, text_lower: str, now: datetime) -> Optional[datetime]:
+        """Parse weekday names from already lowercased text."""
         # Look for weekday names in the text
-        for weekday_name, weekday_num in self.russian_weekdays.items():
-            if weekday_name in text_lower:
-                now = datetime.now(self.moscow_tz)
-                current_weekday = now.weekday()
-                
-                # Calculate days until next occurrence of this weekday
-                days_ahead = (weekday_num - current_weekday) % 7
-                if days_ahead == 0:  # Today is the target weekday
-                    days_ahead = 7  # Move to next week
-                
-                target_date = now + timedelta(days=days_ahead)
-                return target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        weekday_name = self._find_keyword(self._weekday_re, self._weekday_priority, text_lower)
+        if weekday_name is None:
+            return None
         
-        return None
+        weekday_num = self.russian_weekdays[weekday_name]
+        current_weekday = now.weekday()
+        
+        # Calculate days until next occurrence of this weekday
+        days_ahead = (weekday_num - current_weekday) % 7
+        if days_ahead == 0:  # Today is the target weekday
+            days_ahead = 7  # Move to next week
+        
+        target_date = now + timedelta(days=days_ahead)
+        return target_date.replace(hour=0, minute=0, second=0, microsecond=0)
     
-    def parse_relative_date(self, text: str) -> Optional[datetime]:
+    def parse_relative_date(self, text: str, now: Optional[datetime] = None) -> Optional[datetime]:
         """Parse relative dates like 'сегодня', 'завтра', 'послезавтра'."""
-        text_lower = text.lower()
-        
-        for relative_keyword, days_ahead in self.relative_dates.items():
-            if relative_keyword in text_lower:
-                now = datetime.now(self.moscow_tz)
-                target_date = now + timedelta(days=days_ahead)
-                return target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if now is None:
+            now = datetime.now(self.moscow_tz)
+        return self._parse_relative_date(text.lower(), now)
+    
+    def _parse_relative_date(self, text_lower: str, now: datetime) -> Optional[datetime]:
+        """Parse relative dates from already lowercased text."""
+        relative_keyword = self._find_keyword(self._relative_re, self._relative_priority, text_lower)
+        if relative_keyword is None:
+            return None
         
-        return None
+        days_ahead = self.relative_dates[relative_keyword]
+        target_date = now + timedelta(days=days_ahead)
+        return target_date.replace(hour=0, minute=0, second=0, microsecond=0)
     
-    def parse_date_without_year(self, text: str) -> Optional[datetime]:
+    def parse_date_without_year(self, text: str, now: Optional[datetime] = None) -> Optional[datetime]:
         """Parse date without year like '12 июля'."""
+        if now is None:
+            now = datetime.now(self.moscow_tz)
+        return self._parse_date_without_year(text.lower(), now)
+    
+    def _parse_date_without_year(self, text_lower: str, now: datetime) -> Optional[datetime]:
+        """Parse date without year from already lowercased text."""
         # Pattern: number + russian month (no year)
-        pattern = r'(\d{1,2})\s+([а-яё]+)(?!\s+\d{4})'
-        match = re.search(pattern, text.lower())
+        match = _PAT_DATE_NO_YEAR.search(text_lower)
         
         if not match:
             return None
@@ -120,7 +178,6 @@ class ScheduleManager:
         if not month:
             return None
             
-        now = datetime.now(self.moscow_tz)
         current_year = now.year
         
         try:
@@ -137,9 +194,12 @@ class ScheduleManager:
     
     def parse_russian_date(self, text: str) -> Optional[datetime]:
         """Parse Russian date format like '12 июля 2025'."""
+        return self._parse_russian_date(text.lower())
+    
+    def _parse_russian_date(self, text_lower: str) -> Optional[datetime]:
+        """Parse Russian date with year from already lowercased text."""
         # Pattern: number + russian month + year
-        pattern = r'(\d{1,2})\s+([а-яё]+)\s+(\d{4})'
-        match = re.search(pattern, text.lower())
+        match = _PAT_DATE_WITH_YEAR.search(text_lower)
         
         if not match:
             return None
@@ -157,25 +217,43 @@ class ScheduleManager:
         except ValueError:
             return None
     
+    def _parse_date(self, text_lower: str, now: datetime) -> Optional[datetime]:
+        """Try all date formats in order of preference on lowercased text."""
+        # 1. Try full date with year (12 июля 2025)
+        date = self._parse_russian_date(text_lower)
+        
+        # 2. Try weekday names (понедельник, вторник)
+        if not date:
+            date = self._parse_weekday_date(text_lower, now)
+        
+        # 3. Try relative dates (сегодня, завтра)
+        if not date:
+            date = self._parse_relative_date(text_lower, now)
+        
+        # 4. Try date without year (12 июля)
+        if not date:
+            date = self._parse_date_without_year(text_lower, now)
+        
+        return date
+    
     def parse_time_range(self, text: str) -> Optional[Tuple[datetime, datetime]]:
         """Parse various time range formats."""
-        text_lower = text.lower()
-        
+        return self._parse_time_range(text.lower())
+    
+    def _parse_time_range(self, text_lower: str) -> Optional[Tuple[datetime, datetime]]:
+        """Parse time range formats from already lowercased text."""
         # Pattern 1: (с|от)? HH:MM до HH:MM - unified pattern for all "до" formats
-        pattern_do = r'(?:с|от)?\s*(\d{1,2})[:\.](\d{2})\s+до\s+(\d{1,2})[:\.](\d{2})'
-        match_do = re.search(pattern_do, text_lower)
+        match_do = _PAT_DO.search(text_lower)
         if match_do:
             return self._create_time_range(match_do.group(1), match_do.group(2), match_do.group(3), match_do.group(4))
         
         # Pattern 2: HH-HH (short format)
-        pattern_short = r'(\d{1,2})-(\d{1,2})(?!\d)'
-        match_short = re.search(pattern_short, text_lower)
+        match_short = _PAT_SHORT.search(text_lower)
         if match_short:
             return self._create_time_range(match_short.group(1), "00", match_short.group(2), "00")
         
         # Pattern 3: HH:MM-HH:MM (dash format)
-        pattern_dash = r'(\d{1,2})[:\.](\d{2})-(\d{1,2})[:\.](\d{2})'
-        match_dash = re.search(pattern_dash, text_lower)
+        match_dash = _PAT_DASH.search(text_lower)
         if match_dash:
             return self._create_time_range(match_dash.group(1), match_dash.group(2), match_dash.group(3), match_dash.group(4))
         
@@ -216,26 +294,22 @@ class ScheduleManager:
     def _parse_single_time(self, text: str) -> Optional[Tuple[int, int]]:
         """Parse single time formats like 'в 16:00', 'в 16', '16:00'."""
         # Pattern 1: в HH:MM
-        pattern1 = r'в\s+(\d{1,2})[:\.](\d{2})'
-        match1 = re.search(pattern1, text)
+        match1 = _PAT_AT_HM.search(text)
         if match1:
             return int(match1.group(1)), int(match1.group(2))
         
         # Pattern 2: в HH (no minutes)
-        pattern2 = r'в\s+(\d{1,2})(?![:\.])'
-        match2 = re.search(pattern2, text)
+        match2 = _PAT_AT_H.search(text)
         if match2:
             return int(match2.group(1)), 0
         
         # Pattern 3: время HH:MM
-        pattern3 = r'время\s+(\d{1,2})[:\.](\d{2})'
-        match3 = re.search(pattern3, text)
+        match3 = _PAT_VREMYA.search(text)
         if match3:
             return int(match3.group(1)), int(match3.group(2))
         
         # Pattern 4: HH:MM (standalone)
-        pattern4 = r'(?<!\d)(\d{1,2})[:\.](\d{2})(?!\s*[-до])'
-        match4 = re.search(pattern4, text)
+        match4 = _PAT_STANDALONE.search(text)
         if match4:
             hour = int(match4.group(1))
             minute = int(match4.group(2))
@@ -247,26 +321,15 @@ class ScheduleManager:
     
     def parse_slot_info(self, text: str) -> Optional[Dict]:
         """Parse slot information from Russian text."""
-        # Try different date parsing methods in order of preference
-        date = None
-        
-        # 1. Try full date with year (12 июля 2025)
-        date = self.parse_russian_date(text)
-        
-        # 2. Try weekday names (понедельник, вторник)
-        if not date:
-            date = self.parse_weekday_date(text)
-        
-        # 3. Try relative dates (сегодня, завтра)
-        if not date:
-            date = self.parse_relative_date(text)
+        # Lowercase and read the clock once, share them across all parsers
+        text_lower = text.lower()
+        now = datetime.now(self.moscow_tz)
         
-        # 4. Try date without year (12 июля)
-        if not date:
-            date = self.parse_date_without_year(text)
+        # Try different date parsing methods in order of preference
+        date = self._parse_date(text_lower, now)
         
         # Parse time range
-        time_range = self.parse_time_range(text)
+        time_range = self._parse_time_range(text_lower)
         
         if not date or not time_range:
             return None
@@ -295,16 +358,30 @@ class ScheduleManager:
             'original_text': text
         }
     
-    def add_slot(self, text: str) -> Optional[Slot]:
-        """Add a slot from parsed text."""
+    def add_slot(self, text: str) -> Tuple[str, Optional[Slot]]:
+        """Add a slot from parsed text.
+        
+        Returns a (status, slot) tuple where status is 'added', 'duplicate'
+        (slot is the existing one) or 'parse_error' (slot is None).
+        """
         slot_info = self.parse_slot_info(text)
         
         if not slot_info:
-            return None
+            return 'parse_error', None
+        
+        # Check if slot already exists (based on start_time and end_time)
+        key = (slot_info['start_time'], slot_info['end_time'])
+        existing = self._slots_by_key.get(key)
+        if existing is not None:
+            logger.info(f"Duplicate slot detected: {key[0].strftime('%d.%m.%Y')} {key[0].strftime('%H:%M')}-{key[1].strftime('%H:%M')}")
+            return 'duplicate', existing
             
         # Create hash from start_time, end_time, and original_text
         hash_content = f"{slot_info['start_time'].isoformat()}_{slot_info['end_time'].isoformat()}_{text}"
-        slot_id = hashlib.sha256(hash_content.encode()).hexdigest()
+        if blake3 is not None:
+            slot_id = blake3(hash_content.encode()).hexdigest(length=16)
+        else:
+            slot_id = hashlib.sha256(hash_content.encode()).hexdigest()
         
         slot = Slot(
             id=slot_id,
@@ -314,28 +391,22 @@ class ScheduleManager:
             created_at=datetime.now(self.moscow_tz)
         )
         
-        # Check if slot already exists (based on start_time and end_time)
-        if slot in self.slots:
-            logger.info(f"Duplicate slot detected: {slot.start_time.strftime('%d.%m.%Y')} {slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')}")
-            return None
-        
-        self.slots.add(slot)
+        self._slots_by_key[key] = slot
+        self._slots_sorted.add(slot)
         logger.info(f"Added slot: {slot.start_time.strftime('%d.%m.%Y')} {slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')}")
         
-        return slot
+        return 'added', slot
     
     def cleanup_past_slots(self):
         """Remove slots that have already ended."""
         now = datetime.now(self.moscow_tz)
-        before_count = len(self.slots)
         
-        # Keep only slots that haven't ended yet
-        self.slots = {
-            slot for slot in self.slots
-            if slot.end_time > now
-        }
+        # Drop slots that have already ended
+        expired_keys = [key for key, slot in self._slots_by_key.items() if slot.end_time <= now]
+        for key in expired_keys:
+            self._slots_sorted.remove(self._slots_by_key.pop(key))
         
-        removed_count = before_count - len(self.slots)
+        removed_count = len(expired_keys)
         if removed_count > 0:
             logger.info(f"Cleaned up {removed_count} past slot(s)")
     
@@ -347,15 +418,11 @@ class ScheduleManager:
         now = datetime.now(self.moscow_tz)
         cutoff = now + timedelta(days=days_ahead)
         
-        upcoming = [
-            slot for slot in self.slots
-            if slot.start_time >= now and slot.start_time <= cutoff
-        ]
-        
-        # Sort by start time
-        upcoming.sort(key=lambda x: x.start_time)
+        # Slots are already sorted by start time
+        lo = self._slots_sorted.bisect_key_left(now)
+        hi = self._slots_sorted.bisect_key_right(cutoff)
         
-        return upcoming
+        return list(self._slots_sorted[lo:hi])
     
     def format_slot_list(self, slots: List[Slot]) -> str:
         """Format slots as a nice table for telegram."""
@@ -375,4 +442,4 @@ class ScheduleManager:
     
     def get_slot_count(self) -> int:
         """Get total number of slots."""
-        return len(self.slots) 
\ No newline at end of file
+        return len(self._slots_by_key) 
\ No newline at end of file
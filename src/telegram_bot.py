@@ -1,32 +1,113 @@
-from telegram import Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
-from telegram.error import TelegramError
+from telegram import MessageEntity, Update
+from telegram.ext import AIORateLimiter, Application, CommandHandler, MessageHandler, filters
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
+import asyncio
 import logging
+import re
+from typing import Tuple
+from urllib.parse import urlsplit
 from src.schedule_manager import ScheduleManager
 
 
 logger = logging.getLogger(__name__)
 
+HELP_TEXT = """🎾 **Падла Бот - Справка**
+
+**Доступные команды:**
+
+🏓 `/ping` - Проверка на живость
+📅 `/add` - Добавить слот в расписание
+📋 `/list` - Показать запланированные слоты
+❓ `/help` - Показать что умеет
+
+**Как добавить слот:**
+1. Найдите сообщение с датой и временем слота
+2. Ответьте на это сообщение командой `/add`
+3. Бот автоматически распознает дату и время слота
+"""
+
+_MARKDOWN_TOKEN_RE = re.compile(r"\*\*(.+?)\*\*|`([^`]+)`")
+
+
+def _utf16_len(text: str) -> int:
+    """Length of text in UTF-16 code units, as Telegram entity offsets expect"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _strip_markdown(text: str) -> Tuple[str, Tuple[MessageEntity, ...]]:
+    """Convert **bold** and `code` markup into plain text plus message entities"""
+    parts = []
+    entities = []
+    offset = 0
+    pos = 0
+    
+    for match in _MARKDOWN_TOKEN_RE.finditer(text):
+        before = text[pos:match.start()]
+        parts.append(before)
+        offset += _utf16_len(before)
+        
+        bold, code = match.groups()
+        content = bold if bold is not None else code
+        length = _utf16_len(content)
+        entity_type = MessageEntity.BOLD if bold is not None else MessageEntity.CODE
+        entities.append(MessageEntity(type=entity_type, offset=offset, length=length))
+        
+        parts.append(content)
+        offset += length
+        pos = match.end()
+    
+    parts.append(text[pos:])
+    return "".join(parts), tuple(entities)
+
+
+# Help is sent with pre-built entities so no Markdown parsing is needed per call
+HELP_TEXT_PLAIN, HELP_ENTITIES = _strip_markdown(HELP_TEXT)
+
+_SLOT_ADDED_TMPL = """✅ **Слот добавлен!**
+
+📅 **Дата:** {d}
+⏰ **Время:** {t}
+
+Всего слотов: {n}"""
+
 
 class TelegramNotifier:
-    def __init__(self, bot_token: str, chat_id: str):
+    def __init__(self, bot_token: str, chat_id: str, connection_pool_size: int = 32, pool_timeout: float = 10.0):
         self.bot_token = bot_token
         self.chat_id = chat_id
-        self.bot = Bot(token=bot_token)
-        self.application = None
+        self._chat_id_int = int(chat_id)
+        
+        # Separate pools so long-polling getUpdates never starves outbound API calls
+        self.application = (
+            Application.builder()
+            .token(bot_token)
+            # Pace outbound requests below Telegram's global and per-group limits
+            .rate_limiter(AIORateLimiter(overall_max_rate=28, overall_time_period=1, group_max_rate=18, group_time_period=60))
+            .request(HTTPXRequest(connection_pool_size=connection_pool_size, pool_timeout=pool_timeout))
+            .get_updates_request(HTTPXRequest(connection_pool_size=4, pool_timeout=5.0))
+            .concurrent_updates(True)
+            .build()
+        )
+        self.bot = self.application.bot
+        self._handlers_configured = False
+        self._closed = False
+        self._bot_username = None
+        self._mention = None
+        self._ping_re = None
         self.schedule_manager = ScheduleManager()
         
     async def send_message(self, content: str):
         """Send message to the configured chat"""
         try:
             result = await self.bot.send_message(
-                chat_id=self.chat_id,
+                chat_id=self._chat_id_int,
                 text=content
             )
-            logger.info(f"Message sent to chat {self.chat_id}, message_id: {result.message_id}")
+            logger.info("Message sent to chat %s, message_id: %s", self.chat_id, result.message_id)
             return result
         except TelegramError as e:
-            logger.error(f"Failed to send message: {e}")
+            logger.error("Failed to send message: %s", e)
             raise
     
     async def send_chat_message(self, content: str, chat_id: str):
@@ -36,187 +117,202 @@ class TelegramNotifier:
                 chat_id=chat_id,
                 text=content
             )
-            logger.info(f"Message sent to chat {chat_id}, message_id: {result.message_id}")
+            logger.info("Message sent to chat %s, message_id: %s", chat_id, result.message_id)
             return result
         except TelegramError as e:
-            logger.error(f"Failed to send message: {e}")
+            logger.error("Failed to send message: %s", e)
             raise
+    
+    async def send_many(self, contents: list[str]) -> list:
+        """Send several messages to the configured chat concurrently.
+        
+        Returns one entry per message: the sent Message, or the exception raised.
+        """
+        # Bounds in-flight sends below the connection pool size, not their rate;
+        # the application's AIORateLimiter paces them under Telegram's limits
+        sem = asyncio.Semaphore(20)
+        
+        async def _one(content: str):
+            async with sem:
+                return await self.bot.send_message(chat_id=self._chat_id_int, text=content)
+        
+        results = await asyncio.gather(*(_one(content) for content in contents), return_exceptions=True)
+        
+        failed = sum(isinstance(result, BaseException) for result in results)
+        logger.info("Sent %d/%d messages to chat %s", len(results) - failed, len(results), self.chat_id)
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error("Failed to send message: %s", result)
+        
+        return results
 
     async def ping_handler(self, update, context):
         """Handle ping command"""
-        try:
-            # Only respond in the configured chat
-            if str(update.effective_chat.id) == str(self.chat_id):
-                await update.message.reply_text("pong")
-                logger.info(f"Responded to ping command in chat {self.chat_id}")
-        except Exception as e:
-            logger.error(f"Error handling ping command: {e}")
+        await update.message.reply_text("pong")
+        logger.info("Responded to ping command in chat %s", self.chat_id)
 
     async def message_handler(self, update, context):
         """Handle messages that mention the bot with 'ping'"""
-        try:
-            # Only respond in the configured chat
-            if str(update.effective_chat.id) != str(self.chat_id):
-                return
-                
-            message = update.message
-            if message and message.text:
-                # Check if bot is mentioned and message contains 'ping'
-                bot_username = (await context.bot.get_me()).username
-                if f"@{bot_username}" in message.text.lower() and "ping" in message.text.lower():
+        message = update.message
+        # Most messages mention nobody, skip them without scanning the text
+        if not message or not message.text or not message.entities:
+            return
+        
+        for entity in message.entities:
+            # parse_entity handles Telegram's UTF-16 offsets
+            if entity.type == MessageEntity.MENTION and message.parse_entity(entity).lower() == self._mention:
+                # Check if bot is mentioned followed by 'ping'
+                if self._ping_re.search(message.text):
                     await message.reply_text("pong")
-                    logger.info(f"Responded to ping mention in chat {self.chat_id}")
-        except Exception as e:
-            logger.error(f"Error handling message: {e}")
+                    logger.info("Responded to ping mention in chat %s", self.chat_id)
+                return
 
     async def add_handler(self, update, context):
         """Handle /add command - parse slot info from replied message"""
-        try:
-            # Only respond in the configured chat
-            if str(update.effective_chat.id) != str(self.chat_id):
-                return
-                
-            message = update.message
-            if not message.reply_to_message:
-                await message.reply_text("❌ Используйте /add как ответ на сообщение с информацией о слоте")
-                return
-                
-            # Get the replied message text
-            replied_text = message.reply_to_message.text
-            if not replied_text:
-                await message.reply_text("❌ Не удалось получить текст сообщения")
-                return
+        message = update.message
+        if not message.reply_to_message:
+            await message.reply_text("❌ Используйте /add как ответ на сообщение с информацией о слоте")
+            return
             
-            # Try to parse slot info
-            slot = self.schedule_manager.add_slot(replied_text)
+        # Get the replied message text
+        replied_text = message.reply_to_message.text
+        if not replied_text:
+            await message.reply_text("❌ Не удалось получить текст сообщения")
+            return
+        
+        # Try to parse slot info
+        status, slot = self.schedule_manager.add_slot(replied_text)
+        
+        if status == 'parse_error':
+            await message.reply_text("❌ Не удалось распознать дату и время в сообщении")
+            return
+        
+        date_str = slot.start_time.strftime('%d.%m.%Y')
+        time_str = f"{slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')}"
+        
+        if status == 'added':
+            response = _SLOT_ADDED_TMPL.format(d=date_str, t=time_str, n=self.schedule_manager.get_slot_count())
             
-            if slot:
-                date_str = slot.start_time.strftime('%d.%m.%Y')
-                time_str = f"{slot.start_time.strftime('%H:%M')}-{slot.end_time.strftime('%H:%M')}"
-                
-                response = f"""✅ **Слот добавлен!**
-
-📅 **Дата:** {date_str}
-⏰ **Время:** {time_str}
-
-Всего слотов: {self.schedule_manager.get_slot_count()}"""
-                
-                await message.reply_text(response, parse_mode='Markdown')
-                logger.info(f"Added slot: {date_str} {time_str}")
-                
-            else:
-                # Check if it was a parsing error or duplicate
-                slot_info = self.schedule_manager.parse_slot_info(replied_text)
-                if slot_info:
-                    # Parsing worked, so it was a duplicate
-                    date_str = slot_info['start_time'].strftime('%d.%m.%Y')
-                    time_str = f"{slot_info['start_time'].strftime('%H:%M')}-{slot_info['end_time'].strftime('%H:%M')}"
-                    await message.reply_text(f"❌ Слот на {date_str} в {time_str} уже существует")
-                else:
-                    # Parsing failed
-                    await message.reply_text("❌ Не удалось распознать дату и время в сообщении")
-                
-        except Exception as e:
-            logger.error(f"Error handling add command: {e}")
-            await message.reply_text("❌ Произошла ошибка при обработке команды")
+            await message.reply_text(response, parse_mode='Markdown')
+            logger.info("Added slot: %s %s", date_str, time_str)
+            
+        else:
+            # Duplicate of an existing slot
+            await message.reply_text(f"❌ Слот на {date_str} в {time_str} уже существует")
 
     async def list_handler(self, update, context):
         """Handle /list command - show upcoming slots"""
-        try:
-            # Only respond in the configured chat
-            if str(update.effective_chat.id) != str(self.chat_id):
-                return
-                
-            message = update.message
-            upcoming_slots = self.schedule_manager.get_upcoming_slots()
-            formatted_list = self.schedule_manager.format_slot_list(upcoming_slots)
-            
-            await message.reply_text(formatted_list, parse_mode='Markdown')
-            logger.info(f"Displayed {len(upcoming_slots)} upcoming slots")
-            
-        except Exception as e:
-            logger.error(f"Error handling list command: {e}")
-            await message.reply_text("❌ Произошла ошибка при получении списка слотов")
+        message = update.message
+        upcoming_slots = self.schedule_manager.get_upcoming_slots()
+        formatted_list = self.schedule_manager.format_slot_list(upcoming_slots)
+        
+        await message.reply_text(formatted_list, parse_mode='Markdown')
+        logger.info("Displayed %d upcoming slots", len(upcoming_slots))
 
     async def help_handler(self, update, context):
         """Handle /help command - show all available commands"""
-        try:
-            # Only respond in the configured chat
-            if str(update.effective_chat.id) != str(self.chat_id):
-                return
-                
-            message = update.message
-            
-            help_text = """🎾 **Падла Бот - Справка**
-
-**Доступные команды:**
-
-🏓 `/ping` - Проверка на живость
-📅 `/add` - Добавить слот в расписание
-📋 `/list` - Показать запланированные слоты
-❓ `/help` - Показать что умеет
+        message = update.message
+        await message.reply_text(HELP_TEXT_PLAIN, entities=HELP_ENTITIES)
+        logger.info("Help command executed")
 
-**Как добавить слот:**
-1. Найдите сообщение с датой и временем слота
-2. Ответьте на это сообщение командой `/add`
-3. Бот автоматически распознает дату и время слота
-"""
-            
-            await message.reply_text(help_text, parse_mode='Markdown')
-            logger.info("Help command executed")
-            
-        except Exception as e:
-            logger.error(f"Error handling help command: {e}")
-            await message.reply_text("❌ Произошла ошибка при показе справки")
+    async def _on_error(self, update, context):
+        """Log errors raised by handlers and notify the user when possible"""
+        # Registering an error handler replaces PTB's default traceback logging
+        logger.error("Error handling update: %s", context.error, exc_info=context.error)
+        
+        # Connectivity problems (incl. TimedOut) and flood control would most likely fail
+        # the reply too; BadRequest subclasses NetworkError but leaves plain text working
+        if isinstance(context.error, (NetworkError, RetryAfter)) and not isinstance(context.error, BadRequest):
+            return
+        if isinstance(update, Update) and update.effective_message:
+            try:
+                await update.effective_message.reply_text("❌ Произошла ошибка при обработке команды")
+            except TelegramError as e:
+                logger.error("Failed to send error reply: %s", e)
 
     def setup_handlers(self):
         """Setup command and message handlers"""
-        if not self.application:
-            self.application = Application.builder().token(self.bot_token).build()
+        if not self._handlers_configured:
+            # Only respond in the configured chat, filtered before dispatch
+            chat_filter = filters.Chat(chat_id=self._chat_id_int)
             
-            # Add ping command handler
-            self.application.add_handler(CommandHandler("ping", self.ping_handler))
-            
-            # Add add command handler
-            self.application.add_handler(CommandHandler("add", self.add_handler))
-            
-            # Add list command handler
-            self.application.add_handler(CommandHandler("list", self.list_handler))
-            
-            # Add help command handler
-            self.application.add_handler(CommandHandler("help", self.help_handler))
-            
-            # Add message handler for mentions
-            self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.message_handler))
+            handlers = [
+                CommandHandler("ping", self.ping_handler, filters=chat_filter),
+                CommandHandler("add", self.add_handler, filters=chat_filter, block=False),
+                CommandHandler("list", self.list_handler, filters=chat_filter),
+                CommandHandler("help", self.help_handler, filters=chat_filter),
+                # Message handler for mentions
+                MessageHandler(filters.TEXT & ~filters.COMMAND & chat_filter, self.message_handler),
+            ]
+            self.application.add_handlers(handlers)
+            self.application.add_error_handler(self._on_error)
             
+            self._handlers_configured = True
             logger.info("Telegram bot handlers configured (ping, add, list, help)")
 
+    async def _start_application(self):
+        """Initialize and start the application, caching bot identity"""
+        self.setup_handlers()
+        await self.application.initialize()
+        
+        # initialize() already fetched the bot's own user, cache the mention
+        self._bot_username = self.bot.username.lower()
+        self._mention = f"@{self._bot_username}"
+        self._ping_re = re.compile(rf"@{re.escape(self._bot_username)}\b.*\bping\b", re.IGNORECASE | re.DOTALL)
+        
+        await self.application.start()
+
     async def start_polling(self):
         """Start the bot's polling for incoming messages"""
-        if not self.application:
-            self.setup_handlers()
-            
         try:
-            await self.application.initialize()
-            await self.application.start()
-            await self.application.updater.start_polling(drop_pending_updates=True)
+            await self._start_application()
+            await self.application.updater.start_polling(drop_pending_updates=True, allowed_updates=[Update.MESSAGE])
             logger.info("Telegram bot polling started")
         except Exception as e:
-            logger.error(f"Failed to start bot polling: {e}")
+            logger.error("Failed to start bot polling: %s", e)
+            raise
+
+    async def start_webhook(self, url: str, port: int, secret_token: str, listen: str = "0.0.0.0"):
+        """Receive updates via webhook instead of holding a getUpdates connection"""
+        # Serve the same path that is registered with Telegram
+        path = urlsplit(url).path.lstrip("/")
+        
+        try:
+            await self._start_application()
+            # Registers the webhook with Telegram and serves it on listen:port/path;
+            # requests without the matching secret token header are rejected
+            await self.application.updater.start_webhook(
+                listen=listen,
+                port=port,
+                url_path=path,
+                webhook_url=url,
+                secret_token=secret_token,
+                drop_pending_updates=True,
+                allowed_updates=[Update.MESSAGE]
+            )
+            logger.info("Telegram bot webhook started on %s:%s/%s", listen, port, path)
+        except Exception as e:
+            logger.error("Failed to start bot webhook: %s", e)
             raise
 
     async def stop_polling(self):
-        """Stop the bot's polling"""
-        if self.application and self.application.updater.running:
-            try:
+        """Stop the bot's polling (or webhook)"""
+        try:
+            if self.application.updater.running:
                 await self.application.updater.stop()
+            # Startup may have failed after start() or initialize(), e.g. a webhook bind error
+            if self.application.running:
                 await self.application.stop()
-                await self.application.shutdown()
-                logger.info("Telegram bot polling stopped")
-            except Exception as e:
-                logger.error(f"Error stopping bot polling: {e}")
+            # Shuts down the bot and both request pools; a no-op if never initialized
+            await self.application.shutdown()
+            logger.info("Telegram bot polling stopped")
+        except Exception as e:
+            logger.error("Error stopping bot polling: %s", e)
     
     async def close(self):
         """Close the bot session"""
-        await self.stop_polling()
-        await self.bot.shutdown() 
\ No newline at end of file
+        if self._closed:
+            return
+        self._closed = True
+        # application.shutdown() also shuts down the bot and both request pools
+        await self.stop_polling() 
\ No newline at end of file